@@ -1,16 +1,1205 @@
+import heapq
 import random
+from typing import Callable
+
+import numpy as np
 
 from game.client.user_client import UserClient
 from game.common.enums import *
 from game.utils.vector import Vector
 
+# Copies of the game/config.py values the client needs (game.config is not on the engine's ALLOWED_MODULES list)
+MAX_TICKS = 200                                     # the game ends after this turn
+MAX_SECONDS_PER_TURN = 0.2                          # how long the engine waits for take_turn before dropping the client
+INVENTORY_SIZE = 50                                 # slots in each company's inventory
+MAX_MOVEMENT_SPEED = 3                              # Overdrive Drivetrain only unlocks a flag, Superior gets to 3
+DYNAMITE_FUSE = 2                                   # turns between placing dynamite and its blast
+
+# Planning settings
+WORK_UNITS_PER_TURN = 4000                          # search work that fits well inside MAX_SECONDS_PER_TURN, see Deadline
+PLANNING_SAFETY_MARGIN = 0.25                       # fraction of the budget left unused as a reserve
+SCIENCE_POINT_WORTH = 2                             # how many points one science point is worth when ranking ores
+OFF_COMPANY_DEVALUATION = 0.3                       # cash-in multiplier for the other company's special ore
+TURN_WORTH = 5                                      # rough points one turn of mining earns, to weigh risks in turns
+
+# Tech tree rules (game/quarry_rush/tech/tech_tree.py); Mining Robotics is always researched and left out
+TECH_PREREQUISITES: dict[Tech, Tech | None] = {
+    Tech.IMPROVED_DRIVETRAIN: None,
+    Tech.SUPERIOR_DRIVETRAIN: Tech.IMPROVED_DRIVETRAIN,
+    Tech.OVERDRIVE_DRIVETRAIN: Tech.SUPERIOR_DRIVETRAIN,
+    Tech.IMPROVED_MINING: None,
+    Tech.SUPERIOR_MINING: Tech.IMPROVED_MINING,
+    Tech.OVERDRIVE_MINING: Tech.SUPERIOR_MINING,
+    Tech.DYNAMITE: Tech.IMPROVED_MINING,
+    Tech.LANDMINES: Tech.DYNAMITE,
+    Tech.EMPS: Tech.LANDMINES,
+    Tech.TRAP_DEFUSAL: Tech.LANDMINES,
+}
+TECH_EXCLUSIONS: list[frozenset[Tech]] = [frozenset({Tech.EMPS, Tech.TRAP_DEFUSAL})]
+BUY_ACTIONS: dict[Tech, ActionType] = {
+    Tech.IMPROVED_DRIVETRAIN: ActionType.BUY_IMPROVED_DRIVETRAIN,
+    Tech.SUPERIOR_DRIVETRAIN: ActionType.BUY_SUPERIOR_DRIVETRAIN,
+    Tech.OVERDRIVE_DRIVETRAIN: ActionType.BUY_OVERDRIVE_DRIVETRAIN,
+    Tech.IMPROVED_MINING: ActionType.BUY_IMPROVED_MINING,
+    Tech.SUPERIOR_MINING: ActionType.BUY_SUPERIOR_MINING,
+    Tech.OVERDRIVE_MINING: ActionType.BUY_OVERDRIVE_MINING,
+    Tech.DYNAMITE: ActionType.BUY_DYNAMITE,
+    Tech.LANDMINES: ActionType.BUY_LANDMINES,
+    Tech.EMPS: ActionType.BUY_EMPS,
+    Tech.TRAP_DEFUSAL: ActionType.BUY_TRAP_DEFUSAL,
+}
+# Rough extra points per remaining turn that a tech's effect is worth (the others only unlock abilities or flags)
+TECH_EFFECT_POINTS_PER_TURN: dict[Tech, float] = {
+    Tech.IMPROVED_DRIVETRAIN: 1,
+    Tech.SUPERIOR_DRIVETRAIN: 1,
+    Tech.IMPROVED_MINING: 2,
+    Tech.SUPERIOR_MINING: 2,
+    Tech.DYNAMITE: 2,
+}
+ORE_TYPES: list[ObjectType] = [ObjectType.COPIUM, ObjectType.LAMBDIUM, ObjectType.TURITE, ObjectType.ANCIENT_TECH]
+ITEM_CODES: dict[ObjectType, int] = {item_type: code for code, item_type in enumerate(ORE_TYPES, start=1)}  # 0 is none
+TECH_BITS: dict[Tech, int] = {tech: 1 << bit for bit, tech in enumerate(TECH_PREREQUISITES)}
+TECH_PREREQUISITE_BITS: dict[Tech, int] = {tech: TECH_BITS[prerequisite] if prerequisite is not None else 0
+                                           for tech, prerequisite in TECH_PREREQUISITES.items()}
+TECH_EXCLUSION_BITS: list[int] = [sum(TECH_BITS[tech] for tech in exclusion) for exclusion in TECH_EXCLUSIONS]
+
 
 class State(Enum):
     MINING = auto()
     SELLING = auto()
 
 
-class Client(UserClient):
+class BoardGeometry:
+    """
+    Range and shape queries over every tile of a width by height board at once.
+
+    Tiles are flat indices (y * width + x) and every query answers for the whole board with one NumPy expression
+    over the precomputed xs and ys, instead of making a Vector per tile and filtering them with Vector.distance.
+    Masks are flat boolean arrays and tile lists are flat index arrays.
+    """
+
+    # DynamiteController's tile order: the tile itself, then up, right, down and left
+    PLUS: list[tuple[int, int]] = [(0, 0), (0, -1), (1, 0), (0, 1), (-1, 0)]
+
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        self.shape: tuple[int, int] = (height, width)
+        ys, xs = np.indices(self.shape)
+        self.xs: np.ndarray = xs.ravel()
+        self.ys: np.ndarray = ys.ravel()
+        # every tile, column by column (x, then y), the order the engine's nested range loops visit them in
+        self.column_order: np.ndarray = np.lexsort((self.ys, self.xs))
+        self.plus_tiles: list[list[int]] = [[(y + dy) * width + x + dx for dx, dy in self.PLUS
+                                             if 0 <= x + dx < width and 0 <= y + dy < height]
+                                            for y in range(height) for x in range(width)]
+
+    def distances(self, tile: int) -> np.ndarray:
+        """
+        Manhattan distance between tile and every tile, walls ignored.
+        """
+        return np.abs(self.xs - tile % self.width) + np.abs(self.ys - tile // self.width)
+
+    def diamond(self, tile: int, reach: int) -> np.ndarray:
+        """
+        Mask of the tiles within reach of tile.
+        """
+        return self.distances(tile) <= reach
+
+    def ring(self, tile: int, reach: int) -> np.ndarray:
+        """
+        Mask of the tiles whose distance to tile is exactly reach.
+        """
+        return self.distances(tile) == reach
+
+    def in_column_order(self, mask: np.ndarray) -> list[int]:
+        """
+        The tiles in mask, visited x first and then y.
+        """
+        return self.column_order[mask[self.column_order]].tolist()
+
+    def plus(self, tile: int) -> list[int]:
+        """
+        The tile and the on-board tiles next to it, in PLUS order.
+        """
+        return self.plus_tiles[tile]
+
+    def neighbors(self, tile: int) -> list[int]:
+        """
+        The on-board tiles next to tile, walls included.
+        """
+        return self.plus_tiles[tile][1:]
+
+    def spread(self, grid: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        """
+        Convolves a (height x width) grid with a 3x3 kernel, treating everything off the board as 0.
+        """
+        padded = np.pad(grid, 1)
+        return sum(kernel[dy, dx] * padded[dy:dy + self.height, dx:dx + self.width]
+                   for dy in range(3) for dx in range(3))
+
+
+class BoardIndex:
+    """
+    Where each ObjectType sits on one turn's game board.
+
+    GameBoard.get_objects walks every tile and every occupied_by chain each time it is called. The first query on a
+    board walks them once and files every object it meets under its ObjectType, keyed by flat tile index (tiles
+    themselves are filed too); every later query is a dict lookup whose cost is the size of the answer. The client
+    gets a fresh board each turn, so of() keeps the index of the last board asked about and starts a new, unbuilt
+    index when a different board comes along.
+
+    The same walk flattens each tile's occupied_by chain into stacks (the tile first, the top object last) and ORs
+    the bit of every ObjectType in the chain into masks, so asking whether a tile holds dynamite or a station is one
+    bit test instead of another walk down the chain.
+    """
+
+    last: 'BoardIndex | None' = None
+
+    def __init__(self, world):
+        self.world = world
+        self.found: dict[ObjectType, dict[int, list]] | None = None
+        self.stacks: list[list] = []
+        self.masks: list[int] = []
+        self.board_arrays: BoardArrays | None = None
+
+    @classmethod
+    def of(cls, world) -> 'BoardIndex':
+        if cls.last is None or cls.last.world is not world:
+            cls.last = cls(world)
+        return cls.last
+
+    @staticmethod
+    def mask_of(*object_types: ObjectType) -> int:
+        return sum(1 << object_type.value for object_type in set(object_types))
+
+    def __build(self) -> None:
+        self.found = {}
+        for row in self.world.game_map:
+            for occupiable in row:
+                index, stack, mask = len(self.stacks), [], 0
+                while occupiable is not None:
+                    self.found.setdefault(occupiable.object_type, {}).setdefault(index, []).append(occupiable)
+                    stack.append(occupiable)
+                    mask |= 1 << occupiable.object_type.value
+                    occupiable = getattr(occupiable, 'occupied_by', None)
+                self.stacks.append(stack)
+                self.masks.append(mask)
+
+    def get_objects(self, look_for: ObjectType) -> dict[int, list]:
+        """
+        The objects of the given type on each tile that has any, keyed by flat tile index in board order.
+        """
+        if self.found is None:
+            self.__build()
+        return self.found.get(look_for, {})
+
+    def positions(self, look_for: ObjectType) -> list[int]:
+        return list(self.get_objects(look_for))
+
+    def stack(self, index: int) -> list:
+        """
+        Everything on the tile at index, the tile itself first and the top object last.
+        """
+        if self.found is None:
+            self.__build()
+        return self.stacks[index]
+
+    def holds(self, index: int, mask: int) -> bool:
+        """
+        Whether any object on the tile at index has an ObjectType in mask (see mask_of).
+        """
+        if self.found is None:
+            self.__build()
+        return self.masks[index] & mask != 0
+
+    def arrays(self) -> 'BoardArrays':
+        """
+        The board as NumPy grids, built on first use.
+        """
+        if self.board_arrays is None:
+            if self.found is None:
+                self.__build()
+            self.board_arrays = BoardArrays(self)
+        return self.board_arrays
+
+
+class BoardArrays:
+    """
+    One board as a handful of (height x width) NumPy grids, for board-wide questions.
+
+        top_types:      ObjectType value of the top object on each tile (the tile's own when nothing is on it)
+        passable:       False where a wall stands
+        held:           ITEM_CODES code of the item each tile's ore station holds, 0 where there is none
+        trap_owners:    Company value of the trap on each tile, 0 where there is none
+        placed:         True where dynamite or a trap sits, so nothing else can be placed there
+
+    The grids are filled once out of a BoardIndex's flattened stacks; the board is never changed by the client, so
+    they stay in step with it for the whole turn.
+    """
+
+    TRAP_TYPES: int = BoardIndex.mask_of(ObjectType.LANDMINE, ObjectType.EMP)
+    PLACED_TYPES: int = BoardIndex.mask_of(ObjectType.DYNAMITE, ObjectType.LANDMINE, ObjectType.EMP)
+
+    def __init__(self, board_index: BoardIndex):
+        shape = (len(board_index.world.game_map), len(board_index.world.game_map[0]))
+        masks = np.array(board_index.masks, dtype=np.int64)
+        self.top_types: np.ndarray = np.array([stack[-1].object_type.value for stack in board_index.stacks],
+                                              dtype=np.int16).reshape(shape)
+        self.passable: np.ndarray = (masks & BoardIndex.mask_of(ObjectType.WALL) == 0).reshape(shape)
+        self.placed: np.ndarray = (masks & self.PLACED_TYPES != 0).reshape(shape)
+        self.held: np.ndarray = np.zeros(shape, dtype=np.int8)
+        for index, stations in board_index.get_objects(ObjectType.ORE_OCCUPIABLE_STATION).items():
+            if stations[0].held_item is not None:
+                self.held.flat[index] = ITEM_CODES[stations[0].held_item.object_type]
+        self.trap_owners: np.ndarray = np.zeros(shape, dtype=np.int8)
+        for index in np.flatnonzero(masks & self.TRAP_TYPES):
+            trap = next(found for found in board_index.stacks[index]
+                        if found.object_type in (ObjectType.LANDMINE, ObjectType.EMP))
+            self.trap_owners.flat[index] = trap.owner_company.value
+
+
+class DistanceTable:
+    """
+    All-pairs shortest path lengths between the tiles of the game map.
+
+    The table is a (tiles x tiles) uint8 array where table[a, b] is the number of moves between flat tile indices a
+    and b, or UNREACHABLE. It is built once per game by expanding every tile's BFS frontier at the same time: one
+    matrix product against the adjacency matrix advances all 196 searches by one move. After that, any distance
+    lookup is a single array index.
+    """
+
+    UNREACHABLE: int = 255
+
+    def __init__(self, neighbors: list[list[int]], passable: list[bool]):
+        tile_count = len(passable)
+        adjacency = np.zeros((tile_count, tile_count), dtype=np.float32)
+        for index, adjacent in enumerate(neighbors):
+            adjacency[index, adjacent] = 1
+
+        self.table: np.ndarray = np.full((tile_count, tile_count), self.UNREACHABLE, dtype=np.uint8)
+        reached = np.diag(np.array(passable, dtype=bool))
+        self.table[reached] = 0
+
+        frontier = reached.copy()
+        distance = 0
+        while frontier.any():
+            distance += 1
+            frontier = ((frontier.astype(np.float32) @ adjacency) > 0) & ~reached
+            self.table[frontier] = distance
+            reached |= frontier
+
+    def distance(self, start: int, end: int) -> int:
+        return int(self.table[start, end])
+
+    def row(self, index: int) -> np.ndarray:
+        """
+        Distances between one tile and every other tile.
+        """
+        return self.table[index]
+
+
+class PathFinder:
+    """
+    Wall-aware pathfinding over the game map.
+
+    Walls never move during a game, so the passable tiles are read once and a DistanceTable is built when the
+    PathFinder is created. Tiles are stored as flat indices (y * width + x). Asking for the next moves toward a target
+    then only walks down that target's row of the table, which costs one step per move.
+    """
+
+    UNREACHABLE: int = DistanceTable.UNREACHABLE
+
+    # (dx, dy) offsets paired with the action that performs them
+    DIRECTIONS: list[tuple[int, int, ActionType]] = [(0, -1, ActionType.MOVE_UP),
+                                                     (0, 1, ActionType.MOVE_DOWN),
+                                                     (-1, 0, ActionType.MOVE_LEFT),
+                                                     (1, 0, ActionType.MOVE_RIGHT)]
+
+    def __init__(self, world):
+        self.width: int = len(world.game_map[0])
+        self.height: int = len(world.game_map)
+        self.passable: list[bool] = BoardIndex.of(world).arrays().passable.ravel().tolist()
+
+        # for every tile, the passable tiles next to it and the action that moves there
+        self.neighbors: list[list[tuple[int, ActionType]]] = []
+        for index in range(self.width * self.height):
+            x, y = index % self.width, index // self.width
+            self.neighbors.append([(self.index_of(x + dx, y + dy), action) for dx, dy, action in self.DIRECTIONS
+                                   if 0 <= x + dx < self.width and 0 <= y + dy < self.height
+                                   and self.passable[self.index_of(x + dx, y + dy)]])
+
+        self.distances: DistanceTable = DistanceTable([[neighbor for neighbor, _ in adjacent]
+                                                       for adjacent in self.neighbors], self.passable)
+        self.geometry: BoardGeometry = BoardGeometry(self.width, self.height)
+
+    def index_of(self, x: int, y: int) -> int:
+        return y * self.width + x
+
+    def vector_index(self, position: Vector) -> int:
+        return self.index_of(position.x, position.y)
+
+    def distance(self, start: Vector, end: Vector) -> int:
+        """
+        Number of moves between two tiles, or UNREACHABLE if walls separate them.
+        """
+        return self.distances.distance(self.vector_index(start), self.vector_index(end))
+
+    def turns(self, start: Vector, end: Vector, movement_speed: int) -> int:
+        """
+        Number of turns needed to walk between two tiles at the given movement speed.
+        """
+        distance = self.distance(start, end)
+        return distance if distance == self.UNREACHABLE else -(-distance // movement_speed)
+
+    def position_of(self, index: int) -> Vector:
+        return Vector(index % self.width, index // self.width)
+
+    def next_moves(self, start: Vector, end: Vector, max_moves: int, blocked: set[int] | None = None) \
+            -> list[ActionType]:
+        """
+        Follows the distance table toward the end position.
+        :param start:       Position to start at
+        :param end:         Position to get to
+        :param max_moves:   Most moves to return, normally the avatar's movement speed
+        :param blocked:     Tile indices to step around this turn (e.g. the opponent's avatar)
+        :return:            Up to max_moves actions along a shortest path, empty if there is no path
+        """
+        field = self.distances.row(self.vector_index(end)).tolist()
+        current = self.vector_index(start)
+        if field[current] == self.UNREACHABLE:
+            return []
+
+        moves: list[ActionType] = []
+        while len(moves) < max_moves and field[current] > 0:
+            step = next(((neighbor, action) for neighbor, action in self.neighbors[current]
+                         if field[neighbor] == field[current] - 1 and (blocked is None or neighbor not in blocked)),
+                        None)
+            if step is None:
+                break
+            current, action = step
+            moves.append(action)
+        return moves
+
+    def weighted_moves(self, start: Vector, end: Vector, max_moves: int, stop_costs: list[float],
+                       blocked: set[int] | None = None) -> list[ActionType]:
+        """
+        Like next_moves, but every tile the path ends a turn on also costs stop_costs[tile] extra moves.
+
+        Things like traps only matter where the avatar stops, so the search tracks how far into the turn each move
+        is and charges the cost on the last move of each turn and on the end tile (where the avatar stays). Blocked
+        tiles are only avoided during the first turn.
+        :return:    Up to max_moves actions along the cheapest path, empty if there is no path
+        """
+        start_index, end_index = self.vector_index(start), self.vector_index(end)
+        if self.distances.distance(start_index, end_index) == self.UNREACHABLE:
+            return []
+
+        # states are (tile, moves made this turn, still in the first turn)
+        first = (start_index, 0, True)
+        costs = {first: 0.0}
+        previous: dict[tuple[int, int, bool], tuple[tuple[int, int, bool], ActionType]] = {}
+        queue = [(0.0, first)]
+        found = None
+        while len(queue) > 0:
+            cost, state = heapq.heappop(queue)
+            current, phase, first_turn = state
+            if current == end_index:
+                found = state
+                break
+            if cost > costs[state]:
+                continue
+            for neighbor, action in self.neighbors[current]:
+                if first_turn and blocked is not None and neighbor in blocked:
+                    continue
+                turn_over = phase + 1 == max_moves
+                next_state = (neighbor, 0 if turn_over else phase + 1, first_turn and not turn_over)
+                next_cost = cost + 1 + (stop_costs[neighbor] if turn_over or neighbor == end_index else 0)
+                if next_cost < costs.get(next_state, np.inf):
+                    costs[next_state] = next_cost
+                    previous[next_state] = (state, action)
+                    heapq.heappush(queue, (next_cost, next_state))
+
+        if found is None:
+            return []
+        moves: list[ActionType] = []
+        while found != first:
+            found, action = previous[found]
+            moves.append(action)
+        return moves[::-1][:max_moves]
+
+
+class OreIndex:
+    """
+    The ore stations still on the board, keyed by flat tile index.
+
+    Each entry holds the type of the station's held_item and its drop chain. The index is filled with one BoardIndex
+    query on the first turn. Ore stations are never added during a game and always sit directly
+    on their tile, so every later update only checks the tiles already in the index and drops the ones whose station
+    was mined out or blown up by dynamite. The work shrinks as the board empties instead of rescanning every tile and
+    every occupied_by chain.
+
+    A station draws its next item with its own random.Random((19 * x + 23 * y) * seed), and nothing else ever uses
+    that generator, so every item it will hand out in the game is fixed the moment the map is made. drop_chain
+    replays those draws once per station, and after that what a station still holds is a lookup, not a guess.
+    """
+
+    def __init__(self, world, path_finder: PathFinder):
+        self.path_finder: PathFinder = path_finder
+        self.held_items: dict[int, ObjectType] = {}
+        self.drop_chains: dict[int, list[ObjectType]] = {}
+
+        for index, stations in BoardIndex.of(world).get_objects(ObjectType.ORE_OCCUPIABLE_STATION).items():
+            self.held_items[index] = stations[0].held_item.object_type
+            self.drop_chains[index] = self.drop_chain(stations[0])
+
+    @staticmethod
+    def drop_chain(station) -> list[ObjectType]:
+        """
+        Every item the station holds over the game, in order, following OreOccupiableStation.give_item's draws.
+
+        A station always holds Copium first. Mining it rolls Lambdium or Turite (special_weight split in half),
+        otherwise Ancient Tech (ancient_tech_weight) or nothing. Mining a special ore rolls Ancient Tech or nothing,
+        and Ancient Tech is always the last drop.
+        """
+        draws = random.Random((19 * station.position.x + 23 * station.position.y) * station.seed)
+        chain = [ObjectType.COPIUM]
+        roll = draws.random()
+        if roll <= station.special_weight / 2:
+            chain.append(ObjectType.LAMBDIUM)
+        elif roll <= station.special_weight:
+            chain.append(ObjectType.TURITE)
+        if draws.random() <= station.ancient_tech_weight:
+            chain.append(ObjectType.ANCIENT_TECH)
+        return chain
+
+    def __len__(self) -> int:
+        return len(self.held_items)
+
+    def __contains__(self, index: int) -> bool:
+        return index in self.held_items
+
+    def indices(self) -> list[int]:
+        return list(self.held_items)
+
+    def update(self, world) -> list[int]:
+        """
+        Brings the index up to date with this turn's world.
+        :param world:   This turn's game board
+        :return:        Indices of the ore stations that disappeared or now hold a different item since the last update
+        """
+        removed: list[int] = []
+        changed: list[int] = []
+        for index, held_item in self.held_items.items():
+            station = world.game_map[index // self.path_finder.width][index % self.path_finder.width].occupied_by
+            if station is None or station.object_type != ObjectType.ORE_OCCUPIABLE_STATION \
+                    or station.held_item is None:
+                removed.append(index)
+            elif station.held_item.object_type != held_item:
+                changed.append(index)
+                self.held_items[index] = station.held_item.object_type
+
+        for index in removed:
+            self.remove(index)
+        return removed + changed
+
+    def remove(self, index: int) -> None:
+        self.held_items.pop(index, None)
+        self.drop_chains.pop(index, None)
+
+    @staticmethod
+    def item_worth(item_type: ObjectType, company: Company) -> float:
+        """
+        What one item is worth to the given company once cashed in, counting science points as points.
+        """
+        match item_type:
+            case ObjectType.COPIUM:
+                return 20
+            case ObjectType.LAMBDIUM:
+                return 80 if company == Company.CHURCH else round(80 * OFF_COMPANY_DEVALUATION)
+            case ObjectType.TURITE:
+                return 80 if company == Company.TURING else round(80 * OFF_COMPANY_DEVALUATION)
+            case ObjectType.ANCIENT_TECH:
+                return 10 * SCIENCE_POINT_WORTH
+            case _:
+                return 0
+
+    def remaining(self, index: int) -> list[ObjectType]:
+        """
+        The items the station at index still has to hand out, the held one first.
+        """
+        chain = self.drop_chains[index]
+        return chain[chain.index(self.held_items[index]):]
+
+    def expected_counts(self, index: int) -> tuple[float, float, float, float]:
+        """
+        Number of Copium, Lambdium, Turite and Ancient Tech drops the station at index has left.
+        """
+        remaining = self.remaining(index)
+        return tuple(float(remaining.count(item_type)) for item_type in ORE_TYPES)
+
+    def expected_value(self, index: int, company: Company) -> float:
+        """
+        Expected worth of everything the station at index will still drop, one item per mine.
+        """
+        return sum(count * self.item_worth(item_type, company)
+                   for count, item_type in zip(self.expected_counts(index), ORE_TYPES))
+
+    def expected_mines(self, index: int) -> float:
+        """
+        Expected number of MINE actions before the station at index is used up.
+        """
+        return sum(self.expected_counts(index))
+
+
+class InventoryCounters:
+    """
+    Per-company occupancy counters for the 50 slot inventories.
+
+    Every question the client asks about an inventory (how many items, is it full, what is it worth once cashed in)
+    used to walk the whole slot list again. The counters walk each company's list once per turn in update and keep
+    the per-ore counts plus the science points they cash in for, so every query after that is O(1).
+    """
+
+    def __init__(self):
+        self.ore_counts: dict[Company, list[int]] = {company: [0] * len(ORE_TYPES)
+                                                     for company in (Company.CHURCH, Company.TURING)}
+        self.science_points: dict[Company, int] = {company: 0 for company in self.ore_counts}
+
+    def update(self, world) -> None:
+        """
+        Recounts both inventories in this turn's world.
+        """
+        for company, ore_counts in self.ore_counts.items():
+            ore_counts[:] = [0] * len(ORE_TYPES)
+            science_points = 0
+            for item in world.inventory_manager.get_inventory(company):
+                if item is not None:
+                    ore_counts[ITEM_CODES[item.object_type] - 1] += 1
+                    science_points += item.science_point_value
+            self.science_points[company] = science_points
+
+    def counts(self, company: Company) -> list[int]:
+        """
+        Number of Copium, Lambdium, Turite and Ancient Tech items the company holds.
+        """
+        return self.ore_counts[company]
+
+    def count(self, company: Company) -> int:
+        return sum(self.ore_counts[company])
+
+    def is_full(self, company: Company) -> bool:
+        return self.count(company) >= INVENTORY_SIZE
+
+    def free_slots(self, company: Company) -> int:
+        return INVENTORY_SIZE - self.count(company)
+
+    def value(self, company: Company) -> float:
+        """
+        What the held items are worth to the company once cashed in, counting science points as points.
+        """
+        return sum(count * OreIndex.item_worth(item_type, company)
+                   for item_type, count in zip(ORE_TYPES, self.ore_counts[company]))
+
+    def science(self, company: Company) -> int:
+        return self.science_points[company]
+
+
+class OreHeatmap:
+    """
+    A grid of how much ore is worth going after around each tile.
+
+    counts holds one (height x width) grid per item type in ORE_TYPES with the expected drops left on each tile.
+    Weighting them by what each item is worth to our company gives values, and convolving values with KERNEL gives
+    patch: an ore is worth more with other ores next to it. best() discounts patch by the turns to walk there and
+    the turns to walk home again and takes one argmax over the ore tiles. When stations change or disappear, only
+    their cell of counts and values and the KERNEL-sized window of patch around them are rebuilt.
+    """
+
+    KERNEL: np.ndarray = np.array([[0.25, 0.5, 0.25],
+                                   [0.5, 1.0, 0.5],
+                                   [0.25, 0.5, 0.25]])
+
+    def __init__(self, ore_index: OreIndex, path_finder: PathFinder, base_index: int, company: Company):
+        self.ore_index: OreIndex = ore_index
+        self.path_finder: PathFinder = path_finder
+        self.shape: tuple[int, int] = (path_finder.height, path_finder.width)
+        self.worths: np.ndarray = np.array([OreIndex.item_worth(item_type, company) for item_type in ORE_TYPES])
+
+        self.counts: np.ndarray = np.zeros((len(ORE_TYPES), *self.shape))
+        for index in ore_index.indices():
+            self.counts[:, index // self.shape[1], index % self.shape[1]] = ore_index.expected_counts(index)
+        self.values: np.ndarray = np.tensordot(self.worths, self.counts, axes=1)
+        self.is_ore: np.ndarray = self.counts.sum(axis=0) > 0
+
+        self.patch: np.ndarray = path_finder.geometry.spread(self.values, self.KERNEL)
+        self.home_distances: np.ndarray = self.__distances(base_index)
+
+    def __distances(self, start: int) -> np.ndarray:
+        distances = self.path_finder.distances.row(start).reshape(self.shape).astype(np.float64)
+        distances[distances == PathFinder.UNREACHABLE] = np.inf
+        return distances
+
+    def refresh(self, indices: list[int]) -> None:
+        """
+        Rebuilds the cells of the given tiles (and the patch values around them) after their stations changed.
+        """
+        for index in indices:
+            y, x = divmod(index, self.shape[1])
+            self.counts[:, y, x] = self.ore_index.expected_counts(index) if index in self.ore_index else 0
+            value = float(self.worths @ self.counts[:, y, x])
+            change, self.values[y, x] = value - self.values[y, x], value
+            self.is_ore[y, x] = index in self.ore_index
+
+            top, bottom = max(y - 1, 0), min(y + 2, self.shape[0])
+            left, right = max(x - 1, 0), min(x + 2, self.shape[1])
+            self.patch[top:bottom, left:right] += change * self.KERNEL[top - y + 1:bottom - y + 1,
+                                                                      left - x + 1:right - x + 1]
+
+    def best(self, position: int, movement_speed: int, turns_left: int) -> int | None:
+        """
+        The ore tile with the best patch value per turn of walking there and back home, or None if none fits in
+        the turns left.
+        """
+        travel = np.ceil(self.__distances(position) / movement_speed)
+        home = np.ceil(self.home_distances / movement_speed)
+        scores = np.where(self.is_ore & (travel + home <= turns_left), self.patch / (1 + travel + home), -np.inf)
+        best = int(np.argmax(scores))
+        return best if scores.flat[best] > -np.inf else None
+
+
+class MiningPlanner:
+    """
+    Chooses which ore station to walk to next.
+
+    Plans are short tours: walk to an ore, mine it out, maybe walk to more ores, then walk back to base. A tour is
+    scored by expected value per turn spent, counting the walk home. The three stages go progressively deeper and
+    each returns (score, first ore of the best tour):
+
+        greedy:     the single-ore tour to the OreHeatmap's best tile
+        beam:       multi-ore tours, keeping the BEAM_WIDTH best partial tours at each depth
+        rollout:    random tour completions until the deadline runs out, for tours the beam pruned away
+    """
+
+    BEAM_WIDTH: int = 6
+    BEAM_DEPTH: int = 3
+    CANDIDATES: int = 8                             # best next ores considered when extending a tour
+    ROLLOUT_DEPTH: int = 5
+
+    def __init__(self, path_finder: PathFinder, ore_index: OreIndex, heatmap: OreHeatmap, base_index: int,
+                 company: Company):
+        self.path_finder: PathFinder = path_finder
+        self.ore_index: OreIndex = ore_index
+        self.heatmap: OreHeatmap = heatmap
+        self.base_index: int = base_index
+        self.company: Company = company
+        self.random: random.Random = random.Random(base_index)
+
+    def set_turn(self, position: int, movement_speed: int, drop_rate: int, turns_left: int, free_slots: int) -> None:
+        """
+        Captures everything the stages need for this turn.
+        """
+        self.position: int = position
+        self.movement_speed: int = movement_speed
+        self.turns_left: int = turns_left
+        self.free_slots: int = free_slots
+        self.ores: np.ndarray = np.array(self.ore_index.indices(), dtype=np.int64)
+        self.values: np.ndarray = np.array([self.ore_index.expected_value(index, self.company) * drop_rate
+                                            for index in self.ores.tolist()])
+        self.mines: np.ndarray = np.array([self.ore_index.expected_mines(index) for index in self.ores.tolist()])
+        self.items: np.ndarray = self.mines * drop_rate
+        self.home_turns: np.ndarray = self.__travel_turns(self.base_index)
+
+    def __travel_turns(self, start: int) -> np.ndarray:
+        """
+        Turns needed to walk between start and every ore (huge when unreachable).
+        """
+        distances = self.path_finder.distances.row(start)[self.ores].astype(np.float64)
+        distances[distances == PathFinder.UNREACHABLE] = np.inf
+        return np.ceil(distances / self.movement_speed)
+
+    def __extend(self, value: float, turns: float, items: float, position: int, visited: tuple[int, ...],
+                 deadline) -> list[tuple[float, float, float, float, int]]:
+        """
+        Scores every ore that could be added to the end of a tour.
+        :return: (score, value, turns, items, ore position in self.ores) for the CANDIDATES best extensions
+        """
+        deadline.spend(len(self.ores))
+        new_value = value + self.values
+        new_turns = turns + self.__travel_turns(position) + self.mines
+        new_items = items + self.items
+        scores = new_value / (new_turns + self.home_turns)
+        scores[(new_turns + self.home_turns > self.turns_left) | (new_items > self.free_slots)] = -np.inf
+        scores[list(visited)] = -np.inf
+
+        best = np.argsort(-scores)[:self.CANDIDATES]
+        return [(scores[i], new_value[i], new_turns[i], new_items[i], int(i)) for i in best.tolist()
+                if scores[i] > -np.inf]
+
+    def greedy(self, deadline) -> tuple[float, int] | None:
+        deadline.spend(len(self.ores))
+        target = self.heatmap.best(self.position, self.movement_speed, self.turns_left)
+        if target is None:
+            return None
+        ore = int(np.flatnonzero(self.ores == target)[0])
+        turns = self.__travel_turns(self.position)[ore] + self.mines[ore] + self.home_turns[ore]
+        return self.values[ore] / turns, target
+
+    def beam(self, deadline) -> tuple[float, int] | None:
+        best: tuple[float, int] | None = None
+        beam = [(0.0, 0.0, 0.0, self.position, (), None)]
+        for _ in range(self.BEAM_DEPTH):
+            expanded = []
+            for value, turns, items, position, visited, first in beam:
+                if deadline.expired():
+                    return best
+                for score, new_value, new_turns, new_items, ore in self.__extend(value, turns, items, position,
+                                                                                 visited, deadline):
+                    first_ore = first if first is not None else int(self.ores[ore])
+                    expanded.append((score, (new_value, new_turns, new_items, int(self.ores[ore]),
+                                             visited + (ore,), first_ore)))
+                    if best is None or score > best[0]:
+                        best = (score, first_ore)
+            expanded.sort(key=lambda entry: entry[0], reverse=True)
+            beam = [tour for _, tour in expanded[:self.BEAM_WIDTH]]
+        return best
+
+    def rollout(self, deadline) -> tuple[float, int] | None:
+        best: tuple[float, int] | None = None
+        while not deadline.expired():
+            value, turns, items, position, visited, first = 0.0, 0.0, 0.0, self.position, (), None
+            for _ in range(self.ROLLOUT_DEPTH):
+                extensions = self.__extend(value, turns, items, position, visited, deadline)
+                if len(extensions) == 0:
+                    break
+                score, value, turns, items, ore = self.random.choice(extensions)
+                position, visited = int(self.ores[ore]), visited + (ore,)
+                first = first if first is not None else position
+                if best is None or score > best[0]:
+                    best = (score, first)
+            if first is None:
+                break
+        return best
+
+
+class TrapThreatMap:
+    """
+    How much of our inventory the other company's traps would take if a turn ended on each tile.
+
+    A trap goes off when the avatar it targets finishes its actions within the trap's range (Manhattan distance,
+    walls do not matter), and then steals each item with the trap's steal_rate. coverage counts, per steal rate, how
+    many live traps reach each tile. update() compares the other company's trap queue with the traps already counted
+    and only adds or subtracts the range diamond of each trap placed, detonated or defused since the last turn;
+    loss is then rebuilt per steal rate instead of per trap.
+    """
+
+    def __init__(self, path_finder: PathFinder, company: Company):
+        self.company: Company = company
+        self.path_finder: PathFinder = path_finder
+        self.shape: tuple[int, int] = (path_finder.height, path_finder.width)
+        self.traps: set[tuple[int, int, int, float]] = set()
+        self.coverage: dict[float, np.ndarray] = {}
+        self.loss: np.ndarray = np.zeros(self.shape)
+
+    def update(self, world) -> None:
+        queue = world.church_trap_queue if self.company == Company.TURING else world.turing_trap_queue
+        traps = {(trap['position']['x'], trap['position']['y'], trap['range'], trap['steal_rate'])
+                 for trap in queue.to_json()['traps']}
+        if traps == self.traps:
+            return
+
+        for trap in traps - self.traps:
+            self.__cover(trap, 1)
+        for trap in self.traps - traps:
+            self.__cover(trap, -1)
+        self.traps = traps
+
+        kept = np.ones(self.shape)
+        for steal_rate, coverage in self.coverage.items():
+            kept *= (1 - steal_rate) ** coverage
+        self.loss = 1 - kept
+
+    def __cover(self, trap: tuple[int, int, int, float], amount: int) -> None:
+        x, y, reach, steal_rate = trap
+        if steal_rate not in self.coverage:
+            self.coverage[steal_rate] = np.zeros(self.shape, dtype=np.int64)
+        self.coverage[steal_rate] += amount * self.path_finder.geometry.diamond(self.path_finder.index_of(x, y),
+                                                                                  reach).reshape(self.shape)
+
+    def stop_costs(self, inventory_value: float) -> list[float] | None:
+        """
+        Expected loss, in turns of mining, of ending a turn on each tile (flat indices), or None when nothing is at
+        risk.
+        """
+        if len(self.traps) == 0 or inventory_value == 0:
+            return None
+        return (self.loss.ravel() * inventory_value / TURN_WORTH).tolist()
+
+
+class DynamitePlanner:
+    """
+    Finds the best tile to set off dynamite on. Getting there is left to ActionCompiler.go_to, which also steps
+    around avatars and traps.
+
+    A blast takes the held_item out of every ore station on its tile and the four tiles next to it
+    (DynamiteController.handle_detonation), so the blast value of every tile is one convolution of the grid of held
+    item worths with the plus-shaped KERNEL. plan() divides that by the turns it costs: walking there, waiting for
+    the ability's cooldown if it is not ready by then, and the turn spent placing. Tiles that already hold dynamite
+    or a trap are skipped, and the blast has to go off (DYNAMITE_FUSE turns later) before the game ends.
+    """
+
+    KERNEL: np.ndarray = np.array([[0, 1, 0],
+                                   [1, 1, 1],
+                                   [0, 1, 0]])
+
+    def __init__(self, ore_index: OreIndex, path_finder: PathFinder, company: Company):
+        self.ore_index: OreIndex = ore_index
+        self.path_finder: PathFinder = path_finder
+        self.company: Company = company
+        self.shape: tuple[int, int] = (path_finder.height, path_finder.width)
+        self.passable: np.ndarray = np.array(path_finder.passable)
+        self.worths: dict[ObjectType, float] = {item_type: OreIndex.item_worth(item_type, company)
+                                                for item_type in ORE_TYPES}
+        self.occupied: set[int] = set()
+
+    def update(self, world) -> None:
+        """
+        Reads where dynamite and traps sit this turn; none can be placed on those tiles.
+        """
+        self.occupied = set(np.flatnonzero(BoardIndex.of(world).arrays().placed).tolist())
+
+    def blast_values(self) -> np.ndarray:
+        """
+        What a blast on each tile would collect right now, as a flat array.
+        """
+        held = np.zeros(self.shape)
+        for index, item_type in self.ore_index.held_items.items():
+            held.flat[index] = self.worths.get(item_type, 0)
+        return self.path_finder.geometry.spread(held, self.KERNEL).ravel()
+
+    def plan(self, position: Vector, movement_speed: int, ready_in: int, turns_left: int) \
+            -> tuple[float, int] | None:
+        """
+        :param position:        Where the avatar is
+        :param movement_speed:  The avatar's movement speed
+        :param ready_in:        Turns until the dynamite ability can be used again
+        :param turns_left:      Turns left in the game, counting this one
+        :return:                (blast value per turn spent, tile index), or None if no blast is worth anything
+        """
+        start = self.path_finder.vector_index(position)
+        values = self.blast_values()
+        distances = self.path_finder.distances.row(start).astype(np.float64)
+        distances[distances == PathFinder.UNREACHABLE] = np.inf
+        travel = np.ceil(distances / movement_speed)
+        turns = np.maximum(travel, ready_in) + 1
+        scores = np.where(self.passable & (values > 0) & (turns + DYNAMITE_FUSE <= turns_left), values / turns, 0)
+        scores[list(self.occupied)] = 0
+
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return None
+        return float(scores[best]), best
+
+
+class ReturnDeadline:
+    """
+    The latest turn the avatar can leave each tile and still cash in at our CompanyStation before the game ends.
+
+    Ending a move on the station cashes the inventory in, so a tile d moves away is safe to leave on turn
+    MAX_TICKS - ceil(d / speed) + 1 at the latest. One grid per movement speed is built up front, so
+    must_return_now is a single array lookup. SAFETY_TURNS leaves room for being blocked by the other avatar.
+    """
+
+    SAFETY_TURNS: int = 1
+
+    def __init__(self, path_finder: PathFinder, base_index: int):
+        self.path_finder: PathFinder = path_finder
+        distances = path_finder.distances.row(base_index).astype(np.int64)
+        self.latest_departures: dict[int, np.ndarray] = {}
+        for speed in range(1, MAX_MOVEMENT_SPEED + 1):
+            latest = MAX_TICKS - (distances + speed - 1) // speed + 1 - self.SAFETY_TURNS
+            latest[distances == PathFinder.UNREACHABLE] = MAX_TICKS + 1
+            self.latest_departures[speed] = latest
+
+    def latest_departure(self, position: Vector, movement_speed: int = 1) -> int:
+        return int(self.latest_departures[min(movement_speed, MAX_MOVEMENT_SPEED)][
+                       self.path_finder.vector_index(position)])
+
+    def must_return_now(self, position: Vector, turn: int, inventory_value: float, movement_speed: int = 1) -> bool:
+        """
+        Whether the avatar has to head home this turn to cash in inventory_value before the game ends.
+        """
+        return inventory_value > 0 and turn >= self.latest_departure(position, movement_speed)
+
+
+class TechPlanner:
+    """
+    Decides which techs to buy, and in what order.
+
+    Sets of techs are TECH_BITS masks, so being researched, having the prerequisite and breaking an exclusion are
+    each one bit test. The costs and point values are read once through the avatar's TechInfo into a table indexed
+    by bit. Every set of techs the tree allows (each tech's prerequisite included, EMPs and Trap Defusal never
+    together) is listed up front with a row of its bits, so planning is a 0/1 knapsack over that short list, done in
+    one pass of array arithmetic: the set that adds the most points plus effect value, on top of what is already
+    researched, for the science we expect to have by the end of the game. The chosen set is ordered so prerequisites
+    come first and the best value per science point comes early. The schedule is worked out again on each visit to
+    the station, where the client only looks at its head.
+    """
+
+    def __init__(self, avatar):
+        self.techs: list[Tech] = list(TECH_BITS)
+        self.costs: dict[Tech, int] = {}
+        self.points: dict[Tech, int] = {}
+        for tech in self.techs:
+            info = avatar.get_tech_info(tech)
+            self.costs[tech] = info.cost
+            self.points[tech] = info.point_value
+        self.cost_table: np.ndarray = np.array([self.costs[tech] for tech in self.techs])
+        self.point_table: np.ndarray = np.array([self.points[tech] for tech in self.techs], dtype=np.float64)
+        self.effect_table: np.ndarray = np.array([TECH_EFFECT_POINTS_PER_TURN.get(tech, 0) for tech in self.techs],
+                                                 dtype=np.float64)
+
+        self.tech_sets: list[int] = [0]
+        for tech in self.techs:
+            self.tech_sets += [tech_set | TECH_BITS[tech] for tech_set in self.tech_sets
+                               if self.__allows(tech_set | TECH_BITS[tech])]
+        self.tech_set_masks: np.ndarray = np.array(self.tech_sets, dtype=np.int64)
+        self.tech_set_bits: np.ndarray = (self.tech_set_masks[:, None] >> np.arange(len(self.techs))) & 1
+        self.tech_set_costs: np.ndarray = self.tech_set_bits @ self.cost_table
+
+    @staticmethod
+    def __allows(tech_set: int) -> bool:
+        return all(tech_set & TECH_PREREQUISITE_BITS[tech] == TECH_PREREQUISITE_BITS[tech]
+                   for tech, bit in TECH_BITS.items() if tech_set & bit) \
+            and not any(tech_set & exclusion == exclusion for exclusion in TECH_EXCLUSION_BITS)
+
+    @staticmethod
+    def mask_of(tech_names) -> int:
+        """
+        The TECH_BITS mask of the techs named (Avatar.get_researched_techs gives names).
+        """
+        return sum(bit for tech, bit in TECH_BITS.items() if tech.value in tech_names)
+
+    @staticmethod
+    def can_research(researched: int, tech: Tech) -> bool:
+        """
+        Whether the tree lets tech be bought on top of researched, science aside.
+        """
+        with_tech = researched | TECH_BITS[tech]
+        return researched & TECH_BITS[tech] == 0 \
+            and researched & TECH_PREREQUISITE_BITS[tech] == TECH_PREREQUISITE_BITS[tech] \
+            and not any(with_tech & exclusion == exclusion for exclusion in TECH_EXCLUSION_BITS)
+
+    def spent(self, researched: int) -> int:
+        return sum(self.costs[tech] for tech, bit in TECH_BITS.items() if researched & bit)
+
+    def value(self, tech: Tech, turns_left: int) -> float:
+        return self.points[tech] + TECH_EFFECT_POINTS_PER_TURN.get(tech, 0) * turns_left
+
+    def schedule(self, researched: int, budget: int, turns_left: int) -> list[Tech]:
+        """
+        The techs to buy next, in order.
+        :param researched:  TECH_BITS mask of the techs already bought
+        :param budget:      Science points expected to be available for techs by the end of the game
+        :param turns_left:  Turns left in the game
+        """
+        tech_values = self.point_table + self.effect_table * turns_left
+        added = self.tech_set_bits & ~((researched >> np.arange(len(self.techs))) & 1)
+        values = np.where((self.tech_set_costs <= self.spent(researched) + budget)
+                          & (self.tech_set_masks & researched == researched), added @ tech_values, 0)
+        best = int(self.tech_sets[int(np.argmax(values))]) if values.max() > 0 else researched
+
+        order: list[Tech] = []
+        bought, remaining = researched, best & ~researched
+        while remaining != 0:
+            tech = max((tech for tech, bit in TECH_BITS.items() if remaining & bit
+                        and bought & TECH_PREREQUISITE_BITS[tech] == TECH_PREREQUISITE_BITS[tech]),
+                       key=lambda tech: self.value(tech, turns_left) / self.costs[tech])
+            order.append(tech)
+            bought |= TECH_BITS[tech]
+            remaining &= ~TECH_BITS[tech]
+        return order
+
+
+class ActionCompiler:
+    """
+    Turns a high-level intent (go somewhere, mine, sell, buy, place) into the longest action list the engine will run.
+
+    MasterController.turn_logic keeps either the leading moves, cut to the avatar's movement_speed, or only the first
+    action when it is not a move, and then always appends INTERACT_CENTER. So a turn is either a full set of moves or
+    one other action, and ending a turn on our CompanyStation (or buying there) cashes in the inventory for free.
+    Moves that would walk into a wall or an avatar fail, so paths step around any avatar within reach this turn.
+    Every method returns an empty list when the intent cannot be carried out this turn.
+    """
+
+    MOVES: list[ActionType] = [ActionType.MOVE_UP, ActionType.MOVE_DOWN, ActionType.MOVE_LEFT,
+                               ActionType.MOVE_RIGHT]
+    PLACED: int = BoardIndex.mask_of(ObjectType.DYNAMITE, ObjectType.LANDMINE, ObjectType.EMP)
+    ORE_STATION: int = BoardIndex.mask_of(ObjectType.ORE_OCCUPIABLE_STATION)
+
+    def __init__(self, path_finder: PathFinder, base_position: Vector):
+        self.path_finder: PathFinder = path_finder
+        self.base_position: Vector = base_position
+        self.stop_costs: list[float] | None = None      # extra cost of ending a turn on each tile, see TrapThreatMap
+
+    @staticmethod
+    def truncate(actions: list[ActionType], movement_speed: int) -> list[ActionType]:
+        """
+        The part of actions the engine will actually run (without the INTERACT_CENTER it appends).
+        """
+        if len(actions) == 0:
+            return []
+        if actions[0] in ActionCompiler.MOVES:
+            return [action for action in actions if action in ActionCompiler.MOVES][:movement_speed]
+        return [actions[0]]
+
+    def blocked_tiles(self, world, avatar) -> set[int]:
+        """
+        Indices of tiles within movement range that another avatar is standing on.
+        """
+        width = self.path_finder.width
+        return {index for index in BoardIndex.of(world).positions(ObjectType.AVATAR)
+                if 0 < abs(index % width - avatar.position.x) + abs(index // width - avatar.position.y)
+                <= avatar.movement_speed}
+
+    def go_to(self, world, avatar, target: Vector) -> list[ActionType]:
+        if self.stop_costs is not None:
+            return self.path_finder.weighted_moves(avatar.position, target, avatar.movement_speed, self.stop_costs,
+                                                   self.blocked_tiles(world, avatar))
+        return self.path_finder.next_moves(avatar.position, target, avatar.movement_speed,
+                                           self.blocked_tiles(world, avatar))
+
+    def wander(self, world, avatar) -> list[ActionType]:
+        """
+        A random walk of movement_speed legal moves, for when there is nowhere useful to go.
+        """
+        blocked = self.blocked_tiles(world, avatar)
+        current = self.path_finder.vector_index(avatar.position)
+        moves = []
+        for _ in range(avatar.movement_speed):
+            steps = [(neighbor, action) for neighbor, action in self.path_finder.neighbors[current]
+                     if neighbor not in blocked]
+            if len(steps) == 0:
+                break
+            current, action = random.choice(steps)
+            moves.append(action)
+        return moves
+
+    def mine(self, world, avatar, target: Vector | None, free_slots: int) -> list[ActionType]:
+        """
+        Mines the station underfoot if there is room in the inventory, otherwise walks toward target.
+        """
+        if free_slots > 0 and BoardIndex.of(world).holds(self.path_finder.vector_index(avatar.position),
+                                                         self.ORE_STATION):
+            return [ActionType.MINE]
+        return self.go_to(world, avatar, target) if target is not None else []
+
+    def sell(self, world, avatar) -> list[ActionType]:
+        """
+        Walks home; the INTERACT_CENTER the engine appends cashes in on arrival (or right away when already home).
+        """
+        if avatar.position == self.base_position:
+            return [ActionType.INTERACT_CENTER]
+        return self.go_to(world, avatar, self.base_position)
+
+    def buy(self, avatar, buy_action: ActionType) -> list[ActionType]:
+        """
+        Buys a tech when standing on our station; the inventory is cashed in during the same turn.
+        """
+        return [buy_action] if avatar.position == self.base_position else []
+
+    def place(self, world, avatar, place_action: ActionType) -> list[ActionType]:
+        """
+        Places dynamite, a landmine or an EMP underfoot if the ability is off cooldown and the tile is free.
+        """
+        match place_action:
+            case ActionType.PLACE_DYNAMITE:
+                usable = avatar.can_place_dynamite()
+            case ActionType.PLACE_LANDMINE:
+                usable = avatar.can_place_landmine()
+            case ActionType.PLACE_EMP:
+                usable = avatar.can_place_emp()
+            case _:
+                usable = False
+        if not usable or BoardIndex.of(world).holds(self.path_finder.vector_index(avatar.position), self.PLACED):
+            return []
+        return [place_action]
+
+
+class Deadline:
+    """
+    The planning budget for one turn.
+
+    The time module is not on the engine's ALLOWED_MODULES list, so by default the deadline runs on a work counter
+    that only goes up: search code calls spend() for every candidate it scores, and WORK_UNITS_PER_TURN is
+    calibrated to fit well inside MAX_SECONDS_PER_TURN. Any other monotonic clock (time.perf_counter when tuning
+    offline, for example) can be passed in, in which case the budget is measured in that clock's units.
+    """
+
+    def __init__(self, budget: float, safety_margin: float, clock: Callable[[], float] | None = None):
+        self.work_done: int = 0
+        self.clock: Callable[[], float] = clock if clock is not None else lambda: self.work_done
+        self.budget: float = budget
+        self.limit: float = budget * (1 - safety_margin)
+        self.started: float = self.clock()
+
+    def spend(self, units: int = 1) -> None:
+        self.work_done += units
+
+    def used(self) -> float:
+        return self.clock() - self.started
+
+    def expired(self) -> bool:
+        return self.used() >= self.limit
+
+    def fraction_used(self) -> float:
+        return self.used() / self.budget
+
+
+class AnytimeClient(UserClient):
+    """
+    A UserClient that plans against a per-turn Deadline.
+
+    take_turn starts a Deadline, lets the subclass decide in plan_turn, and appends the fraction of the budget the
+    turn used to budget_log. Inside plan_turn, run_stages runs progressively deeper search stages and keeps the best
+    result so far, stopping as soon as the deadline (minus the safety margin) runs out. The first stage always runs,
+    so there is always a plan to return.
+    """
+
+    def __init__(self, budget: float = WORK_UNITS_PER_TURN, safety_margin: float = PLANNING_SAFETY_MARGIN,
+                 clock: Callable[[], float] | None = None):
+        super().__init__()
+        self.budget: float = budget
+        self.safety_margin: float = safety_margin
+        self.clock: Callable[[], float] | None = clock
+        self.deadline: Deadline | None = None
+        self.budget_log: list[float] = []
+
+    def take_turn(self, turn, actions, world, avatar):
+        self.deadline = Deadline(self.budget, self.safety_margin, self.clock)
+        actions = self.plan_turn(turn, actions, world, avatar)
+        self.budget_log.append(self.deadline.fraction_used())
+        return actions
+
+    def plan_turn(self, turn, actions, world, avatar):
+        raise NotImplementedError("Implement this in subclass")
+
+    def run_stages(self, stages: list[Callable[[Deadline], tuple[float, object] | None]]) \
+            -> tuple[float, object] | None:
+        """
+        Runs each stage in order while the deadline allows and returns the best (score, plan) any of them found.
+        """
+        best = None
+        for stage in stages:
+            if best is not None and self.deadline.expired():
+                break
+            result = stage(self.deadline)
+            if result is not None and (best is None or result[0] > best[0]):
+                best = result
+        return best
+
+
+class Client(AnytimeClient):
     # Variables and info you want to save between turns go here
     def __init__(self):
         super().__init__()
@@ -29,10 +1218,25 @@ class Client(UserClient):
         self.company = avatar.company
         self.my_station_type = ObjectType.TURING_STATION if self.company == Company.TURING else ObjectType.CHURCH_STATION
         self.current_state = State.MINING
-        self.base_position = world.get_objects(self.my_station_type)[0][0]
+        self.path_finder = PathFinder(world)
+        self.base_position = self.path_finder.position_of(BoardIndex.of(world).positions(self.my_station_type)[0])
+        self.ore_index = OreIndex(world, self.path_finder)
+        base_index = self.path_finder.vector_index(self.base_position)
+        self.ore_heatmap = OreHeatmap(self.ore_index, self.path_finder, base_index, self.company)
+        self.mining_planner = MiningPlanner(self.path_finder, self.ore_index, self.ore_heatmap, base_index,
+                                            self.company)
+        self.mining_target = None
+        self.action_compiler = ActionCompiler(self.path_finder, self.base_position)
+        self.tech_planner = TechPlanner(avatar)
+        self.return_deadline = ReturnDeadline(self.path_finder, base_index)
+        self.threat_map = TrapThreatMap(self.path_finder, self.company)
+        self.dynamite_planner = DynamitePlanner(self.ore_index, self.path_finder, self.company)
+        self.inventory_counters = InventoryCounters()
+        self.researched: int = 0
+        self.tech_schedule: list[Tech] = []
 
     # This is where your AI will decide what to do
-    def take_turn(self, turn, actions, world, avatar):
+    def plan_turn(self, turn, actions, world, avatar):
         """
         This is where your AI will decide what to do.
         :param turn:        The current turn of the game.
@@ -41,67 +1245,107 @@ class Client(UserClient):
         """
         if turn == 1:
             self.first_turn_init(world, avatar)
+        else:
+            self.ore_heatmap.refresh(self.ore_index.update(world))
+            self.threat_map.update(world)
             
-        current_tile = world.game_map[avatar.position.y][avatar.position.x] # set current tile to the tile that I'm standing on
+        current_tile = self.path_finder.vector_index(avatar.position) # set current tile to the tile that I'm standing on
         
         # If I start the turn on my station, I should...
-        if current_tile.occupied_by.object_type == self.my_station_type:
-            # buy Improved Mining tech if I can...
-            if avatar.science_points >= avatar.get_tech_info('Improved Mining').cost and not avatar.is_researched('Improved Mining'):
-                return [ActionType.BUY_IMPROVED_MINING]
-            if avatar.science_points >= avatar.get_tech_info('Dynamite').cost and not avatar.is_researched('Dynamite'):
-                return [ActionType.BUY_DYNAMITE]
-            if avatar.science_points >= avatar.get_tech_info('Improved Drivetrain').cost and not avatar.is_researched('Improved Drivetrain'):
-                return [ActionType.BUY_IMPROVED_DRIVETRAIN]
-            if avatar.science_points >= avatar.get_tech_info('Superior Mining').cost and not avatar.is_researched('Superior Mining'):
-                return [ActionType.BUY_SUPERIOR_MINING]
-            if avatar.science_points >= avatar.get_tech_info('Landmines').cost and not avatar.is_researched('Landmines'):
-                return [ActionType.BUY_LANDMINES]
-            if avatar.science_points >= avatar.get_tech_info('Superior Drivetrain').cost and not avatar.is_researched('Superior Drivetrain'):
-                return [ActionType.BUY_SUPERIOR_DRIVETRAIN]
-            if avatar.science_points >= avatar.get_tech_info('EMPs').cost and not avatar.is_researched('EMPs'):
-                return [ActionType.BUY_EMPS] 
-            if avatar.science_points >= avatar.get_tech_info('Overdrive Mining').cost and not avatar.is_researched('Overdrive Mining'):
-                return [ActionType.BUY_OVERDRIVE_MINING]  
-            if avatar.science_points >= avatar.get_tech_info('Overdrive Drivetrain').cost and not avatar.is_researched('Overdrive Drivetrain'):
-                return [ActionType.BUY_OVERDRIVE_DRIVETRAIN]
+        if BoardIndex.of(world).holds(current_tile, BoardIndex.mask_of(self.my_station_type)):
+            # buy the next tech in the plan if I can afford it...
+            self.researched = TechPlanner.mask_of(avatar.get_researched_techs())
+            spent = self.tech_planner.spent(self.researched)
+            turns_left = MAX_TICKS - turn + 1
+            expected_science = avatar.science_points + (avatar.science_points + spent) * turns_left // turn
+            self.tech_schedule = self.tech_planner.schedule(self.researched, expected_science, turns_left)
+            if len(self.tech_schedule) > 0 and avatar.science_points >= self.tech_planner.costs[self.tech_schedule[0]]:
+                return self.action_compiler.buy(avatar, BUY_ACTIONS[self.tech_schedule[0]])
             # otherwise set my state to mining
             self.current_state = State.MINING
             
-        # If I have at least 5 items in my inventory, set my state to selling
-        if len([item for item in self.get_my_inventory(world) if item is not None]) >= 5:
+        # If my inventory is full, cashing it in buys my next tech, or the game is about to end, set my state to selling
+        self.inventory_counters.update(world)
+        held_items = self.inventory_counters.count(self.company)
+        inventory_value = self.inventory_counters.value(self.company)
+        held_science = self.inventory_counters.science(self.company)
+        self.action_compiler.stop_costs = self.threat_map.stop_costs(inventory_value)
+        if held_items >= INVENTORY_SIZE \
+                or (len(self.tech_schedule) > 0 and held_science > 0
+                    and avatar.science_points + held_science >= self.tech_planner.costs[self.tech_schedule[0]]) \
+                or self.return_deadline.must_return_now(avatar.position, turn, inventory_value, avatar.movement_speed):
             self.current_state = State.SELLING
             
         # Make action decision for this turn
         if self.current_state == State.SELLING:
-            # actions = [ActionType.MOVE_LEFT if self.company == Company.TURING else ActionType.MOVE_RIGHT] # If I'm selling, move towards my base
-            actions = self.generate_moves(avatar.position, self.base_position, turn % 2 == 0)
+            # If I'm selling, move towards my base
+            actions = self.action_compiler.sell(world, avatar)
         else:
-            if current_tile.occupied_by.object_type == ObjectType.ORE_OCCUPIABLE_STATION:
+            # If a blast somewhere is worth more than a turn of mining, go set off dynamite there
+            actions = self.dynamite_actions(world, avatar, turn) if self.researched & TECH_BITS[Tech.DYNAMITE] else []
+            if len(actions) == 0:
+                actions = self.action_compiler.mine(world, avatar, None,
+                                                   self.inventory_counters.free_slots(self.company))
+            if len(actions) > 0:
                 # If I'm mining and I'm standing on an ore, mine it
-                actions = [ActionType.MINE]
+                self.mining_target = None if actions == [ActionType.MINE] else self.mining_target
             else:
-                # If I'm mining and I'm not standing on an ore, move randomly
-                actions = [random.choice([ActionType.MOVE_LEFT, ActionType.MOVE_RIGHT, ActionType.MOVE_UP, ActionType.MOVE_DOWN])]
+                # If I'm mining and I'm not standing on an ore, walk to the start of the best tour I can find in time,
+                # sticking with the ore I was already walking to until someone else mines it out
+                if self.mining_target not in self.ore_index:
+                    self.mining_planner.set_turn(self.path_finder.vector_index(avatar.position),
+                                                 avatar.movement_speed, avatar.drop_rate, MAX_TICKS - turn + 1,
+                                                 INVENTORY_SIZE - held_items)
+                    plan = self.run_stages([self.mining_planner.greedy, self.mining_planner.beam,
+                                            self.mining_planner.rollout])
+                    self.mining_target = plan[1] if plan is not None else None
+                actions = self.action_compiler.go_to(world, avatar, self.path_finder.position_of(self.mining_target)) \
+                    if self.mining_target is not None else []
+
+            # If there is nowhere to go, move randomly
+            if len(actions) == 0:
+                actions = self.action_compiler.wander(world, avatar)
                 
-        return actions
+        return self.action_compiler.truncate(actions, avatar.movement_speed)
 
-    def generate_moves(self, start_position, end_position, vertical_first):
+    def dynamite_actions(self, world, avatar, turn):
         """
-        This function will generate a path between the start and end position. It does not consider walls and will
-        try to walk directly to the end position.
+        Walks to (or places) the best dynamite blast if it beats what mining would earn in the same turns.
+        :return:    This turn's actions, empty if mining is better
+        """
+        self.dynamite_planner.update(world)
+        ability = avatar.dynamite_active_ability
+        # trap_detonation_control decreases every fuse once after each client that acts, so the fuse seen here drops
+        # once per avatar between turns, and decrease_fuse only marks the ability usable on the decrease after its
+        # fuse reaches 0 (fuse + 1 decreases, the same count SimAvatar.from_fuses uses)
+        decreases_per_turn = max(len(BoardIndex.of(world).positions(ObjectType.AVATAR)), 1)
+        ready_in = 0 if ability.is_usable else -(-(ability.fuse + 1) // decreases_per_turn)
+        plan = self.dynamite_planner.plan(avatar.position, avatar.movement_speed, ready_in, MAX_TICKS - turn + 1)
+        if plan is None:
+            return []
+
+        stations = BoardIndex.of(world).get_objects(ObjectType.ORE_OCCUPIABLE_STATION)
+        station = stations.get(self.path_finder.vector_index(avatar.position), [None])[0]
+        mining_worth = TURN_WORTH * avatar.drop_rate
+        if station is not None and station.held_item is not None:
+            mining_worth = OreIndex.item_worth(station.held_item.object_type, self.company) * avatar.drop_rate
+        score, target = plan
+        if score <= mining_worth:
+            return []
+        if target == self.path_finder.vector_index(avatar.position):
+            return self.action_compiler.place(world, avatar, ActionType.PLACE_DYNAMITE)
+        return self.action_compiler.go_to(world, avatar, self.path_finder.position_of(target))
+
+    def generate_moves(self, start_position, end_position, max_moves):
+        """
+        This function will generate a path between the start and end position. It walks around walls using the
+        distance table built in first_turn_init.
         :param start_position:      Position to start at
         :param end_position:        Position to get to
-        :param vertical_first:      True if the path should be vertical first, False if the path should be horizontal first
+        :param max_moves:           Most moves to take this turn, normally the avatar's movement speed
         :return:                    Path represented as a list of ActionType
         """
-        dx = end_position.x - start_position.x
-        dy = end_position.y - start_position.y
-        
-        horizontal = [ActionType.MOVE_LEFT] * -dx if dx < 0 else [ActionType.MOVE_RIGHT] * dx
-        vertical = [ActionType.MOVE_UP] * -dy if dy < 0 else [ActionType.MOVE_DOWN] * dy
-        
-        return vertical + horizontal if vertical_first else horizontal + vertical
+        return self.path_finder.next_moves(start_position, end_position, max_moves)
     
     def get_my_inventory(self, world):
         return world.inventory_manager.get_inventory(self.company)
@@ -10,6 +10,108 @@ class State(Enum):
     SELLING = auto()
 
 
+class PathFinder:
+    """
+    Wall-aware pathfinding over the game map.
+
+    Walls never move during a game, so the passable tiles are read once and a BFS distance field is built for every
+    passable tile when the PathFinder is created. Tiles are stored as flat indices (y * width + x). Asking for the
+    next moves toward a target then only walks down that target's field, which costs one step per move.
+    """
+
+    UNREACHABLE: int = -1
+
+    # (dx, dy) offsets paired with the action that performs them
+    DIRECTIONS: list[tuple[int, int, ActionType]] = [(0, -1, ActionType.MOVE_UP),
+                                                     (0, 1, ActionType.MOVE_DOWN),
+                                                     (-1, 0, ActionType.MOVE_LEFT),
+                                                     (1, 0, ActionType.MOVE_RIGHT)]
+
+    def __init__(self, world):
+        self.width: int = len(world.game_map[0])
+        self.height: int = len(world.game_map)
+        self.passable: list[bool] = [tile.occupied_by is None or tile.occupied_by.object_type != ObjectType.WALL
+                                     for row in world.game_map for tile in row]
+
+        # for every tile, the passable tiles next to it and the action that moves there
+        self.neighbors: list[list[tuple[int, ActionType]]] = []
+        for index in range(self.width * self.height):
+            x, y = index % self.width, index // self.width
+            self.neighbors.append([(self.index_of(x + dx, y + dy), action) for dx, dy, action in self.DIRECTIONS
+                                   if 0 <= x + dx < self.width and 0 <= y + dy < self.height
+                                   and self.passable[self.index_of(x + dx, y + dy)]])
+
+        self.fields: dict[int, list[int]] = {index: self.__build_field(index)
+                                             for index in range(len(self.passable)) if self.passable[index]}
+
+    def index_of(self, x: int, y: int) -> int:
+        return y * self.width + x
+
+    def vector_index(self, position: Vector) -> int:
+        return self.index_of(position.x, position.y)
+
+    def __build_field(self, target: int) -> list[int]:
+        """
+        Breadth first search outward over the passable tiles. Walking is symmetric, so the distance out to a tile
+        is also the distance back to the target.
+        """
+        field = [self.UNREACHABLE] * len(self.passable)
+        field[target] = 0
+        frontier = [target]
+        while frontier:
+            next_frontier = []
+            for index in frontier:
+                for neighbor, _ in self.neighbors[index]:
+                    if field[neighbor] == self.UNREACHABLE:
+                        field[neighbor] = field[index] + 1
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return field
+
+    def distance(self, start: Vector, end: Vector) -> int:
+        """
+        Number of moves between two tiles, or -1 if walls separate them.
+        """
+        field = self.fields.get(self.vector_index(end))
+        return self.UNREACHABLE if field is None else field[self.vector_index(start)]
+
+    def closest(self, start: Vector, targets: list[Vector]) -> Vector | None:
+        """
+        Returns whichever target is the fewest moves away, or None if none of them can be reached.
+        """
+        field = self.fields.get(self.vector_index(start))
+        if field is None:
+            return None
+        reachable = [target for target in targets if field[self.vector_index(target)] != self.UNREACHABLE]
+        return min(reachable, key=lambda target: field[self.vector_index(target)], default=None)
+
+    def next_moves(self, start: Vector, end: Vector, max_moves: int, blocked: set[int] | None = None) \
+            -> list[ActionType]:
+        """
+        Follows the distance field of the end position downhill.
+        :param start:       Position to start at
+        :param end:         Position to get to
+        :param max_moves:   Most moves to return, normally the avatar's movement speed
+        :param blocked:     Tile indices to step around this turn (e.g. the opponent's avatar)
+        :return:            Up to max_moves actions along a shortest path, empty if there is no path
+        """
+        field = self.fields.get(self.vector_index(end))
+        current = self.vector_index(start)
+        if field is None or field[current] == self.UNREACHABLE:
+            return []
+
+        moves: list[ActionType] = []
+        while len(moves) < max_moves and field[current] > 0:
+            step = next(((neighbor, action) for neighbor, action in self.neighbors[current]
+                         if field[neighbor] == field[current] - 1 and (blocked is None or neighbor not in blocked)),
+                        None)
+            if step is None:
+                break
+            current, action = step
+            moves.append(action)
+        return moves
+
+
 class Client(UserClient):
     # Variables and info you want to save between turns go here
     def __init__(self):
@@ -30,6 +132,7 @@ class Client(UserClient):
         self.my_station_type = ObjectType.TURING_STATION if self.company == Company.TURING else ObjectType.CHURCH_STATION
         self.current_state = State.MINING
         self.base_position = world.get_objects(self.my_station_type)[0][0]
+        self.path_finder = PathFinder(world)
 
     # This is where your AI will decide what to do
     def take_turn(self, turn, actions, world, avatar):
@@ -59,33 +162,33 @@ class Client(UserClient):
         # Make action decision for this turn
         if self.current_state == State.SELLING:
             # actions = [ActionType.MOVE_LEFT if self.company == Company.TURING else ActionType.MOVE_RIGHT] # If I'm selling, move towards my base
-            actions = self.generate_moves(avatar.position, self.base_position, turn % 2 == 0)
+            actions = self.generate_moves(avatar.position, self.base_position, avatar.movement_speed)
         else:
             if current_tile.occupied_by.object_type == ObjectType.ORE_OCCUPIABLE_STATION:
                 # If I'm mining and I'm standing on an ore, mine it
                 actions = [ActionType.MINE]
             else:
-                # If I'm mining and I'm not standing on an ore, move randomly
+                # If I'm mining and I'm not standing on an ore, walk to the closest one
+                ores = [position for position, _ in world.get_objects(ObjectType.ORE_OCCUPIABLE_STATION)]
+                target = self.path_finder.closest(avatar.position, ores)
+                actions = self.generate_moves(avatar.position, target, avatar.movement_speed) if target else []
+
+            # If there is nowhere to go, move randomly
+            if len(actions) == 0:
                 actions = [random.choice([ActionType.MOVE_LEFT, ActionType.MOVE_RIGHT, ActionType.MOVE_UP, ActionType.MOVE_DOWN])]
                 
         return actions
 
-    def generate_moves(self, start_position, end_position, vertical_first):
+    def generate_moves(self, start_position, end_position, max_moves):
         """
-        This function will generate a path between the start and end position. It does not consider walls and will
-        try to walk directly to the end position.
+        This function will generate a path between the start and end position. It walks around walls using the
+        distance fields built in first_turn_init.
         :param start_position:      Position to start at
         :param end_position:        Position to get to
-        :param vertical_first:      True if the path should be vertical first, False if the path should be horizontal first
+        :param max_moves:           Most moves to take this turn, normally the avatar's movement speed
         :return:                    Path represented as a list of ActionType
         """
-        dx = end_position.x - start_position.x
-        dy = end_position.y - start_position.y
-        
-        horizontal = [ActionType.MOVE_LEFT] * -dx if dx < 0 else [ActionType.MOVE_RIGHT] * dx
-        vertical = [ActionType.MOVE_UP] * -dy if dy < 0 else [ActionType.MOVE_DOWN] * dy
-        
-        return vertical + horizontal if vertical_first else horizontal + vertical
-
+        return self.path_finder.next_moves(start_position, end_position, max_moves)
+    
     def get_my_inventory(self, world):
         return world.inventory_manager.get_inventory(self.company)
@@ -0,0 +1,328 @@
+"""
+An offline forward model of the engine's turn logic, for checking the client's rules against recorded games.
+
+The engine only loads the *client* files in this directory, so nothing here ships with the bot; tests/ imports it.
+"""
+import random
+
+from game.common.enums import *
+
+from base_client import (BUY_ACTIONS, DYNAMITE_FUSE, INVENTORY_SIZE, ITEM_CODES, ORE_TYPES, TECH_BITS, ActionCompiler,
+                         BoardIndex, InventoryCounters, OreIndex, PathFinder, TechPlanner)
+
+MAX_NUMBER_OF_ACTIONS_PER_TURN = 5                  # actions turn_logic runs per client, INTERACT_CENTER included
+DYNAMITE_COOLDOWN = 3                               # fuse the dynamite ability gets after placing
+LANDMINE_COOLDOWN = 4                               # fuse the landmine ability gets after placing
+EMP_COOLDOWN = 4                                    # fuse the EMP ability gets after placing
+LANDMINE_STEAL_RATE = 0.5                           # chance a landmine steals each item
+LANDMINE_RANGE = 1                                  # distance at which a landmine goes off
+EMP_STEAL_RATE = 1.0                                # chance an EMP steals each item
+EMP_RANGE = 2                                       # distance at which an EMP goes off
+TRAP_DEFUSAL_RANGE = EMP_RANGE + 1                  # distance DEFUSE clears traps at
+MAX_TRAPS = 10                                      # traps a company can have out before the oldest is removed
+
+
+class SimAvatar:
+    """
+    An avatar inside a SimState, as plain ints.
+
+    ready_at holds, for the DYNAMITE, LANDMINE and EMP abilities, the SimState fuse_clock reading at which each one
+    can be used again, so nothing has to count down. It mirrors ActiveAbility, quirk included: decrease_fuse only
+    marks an ability usable on the decrease after its fuse reaches 0, one decrease later than the cooldown alone
+    would say. from_fuses turns an ActiveAbility's fuse and is_usable into that form. techs is a TECH_BITS mask and
+    inventory holds how many of each ORE_TYPES item the company is carrying.
+    """
+
+    DYNAMITE, LANDMINE, EMP = 0, 1, 2
+    COOLDOWNS: list[int] = [DYNAMITE_COOLDOWN, LANDMINE_COOLDOWN, EMP_COOLDOWN]
+
+    def __init__(self, company: Company, position: int, score: int = 0, science: int = 0, movement_speed: int = 1,
+                 drop_rate: int = 1, techs: int = 0, ready_at: list[int] | None = None,
+                 inventory: list[int] | None = None):
+        self.company: Company = company
+        self.position: int = position
+        self.score: int = score
+        self.science: int = science
+        self.movement_speed: int = movement_speed
+        self.drop_rate: int = drop_rate
+        self.techs: int = techs
+        self.ready_at: list[int] = ready_at if ready_at is not None else [0, 0, 0]
+        self.inventory: list[int] = inventory if inventory is not None else [0] * len(ORE_TYPES)
+
+    def clone(self) -> 'SimAvatar':
+        return SimAvatar(self.company, self.position, self.score, self.science, self.movement_speed, self.drop_rate,
+                         self.techs, self.ready_at[:], self.inventory[:])
+
+    def researched(self, tech: Tech) -> bool:
+        return self.techs & TECH_BITS[tech] != 0
+
+    def free_slots(self) -> int:
+        return INVENTORY_SIZE - sum(self.inventory)
+
+    @staticmethod
+    def from_fuses(fuses: list[int], usable: list[bool], clock: int = 0) -> list[int]:
+        return [clock if is_usable else clock + fuse + 1 for fuse, is_usable in zip(fuses, usable)]
+
+    def is_usable(self, ability: int, clock: int) -> bool:
+        return clock >= self.ready_at[ability]
+
+    def fuse(self, ability: int, clock: int) -> int:
+        return max(self.ready_at[ability] - 1 - clock, 0)
+
+    def reset_fuse(self, ability: int, clock: int) -> None:
+        self.ready_at[ability] = clock + self.COOLDOWNS[ability] + 1 if self.COOLDOWNS[ability] > 0 else clock
+
+
+class SimState:
+    """
+    One moment of the game as flat lists of ints, with tiles as flat indices.
+
+        held:       ITEM_CODES code of the item each tile's ore station holds, 0 where there is no station
+        dynamite:   [tile, blast tick, company] per dynamite, in DynamiteList order
+        traps:      [tile, range, steal_rate] per trap in each company's TrapQueue order
+        trap_tiles: tiles with a trap on them
+        avatars:    a SimAvatar per company
+        fuse_clock: how many times the abilities' fuses have been decreased (see SimAvatar.ready_at)
+
+    Timers are kept as the tick or fuse_clock reading at which they run out instead of as countdowns, so a turn
+    only advances tick and fuse_clock and never touches the timers themselves. Every dynamite blasts DYNAMITE_FUSE
+    ticks after it is placed and DynamiteList keeps placement order, so the dynamite due to blast is always at the
+    front of the list. clone() only copies these lists, which is far cheaper than copying a GameBoard and its
+    occupied_by chains.
+    """
+
+    def __init__(self, tick: int, held: list[int], dynamite: list[list], traps: dict[Company, list[list]],
+                 trap_tiles: set[int], avatars: dict[Company, SimAvatar], fuse_clock: int = 0):
+        self.tick: int = tick
+        self.held: list[int] = held
+        self.dynamite: list[list] = dynamite
+        self.traps: dict[Company, list[list]] = traps
+        self.trap_tiles: set[int] = trap_tiles
+        self.avatars: dict[Company, SimAvatar] = avatars
+        self.fuse_clock: int = fuse_clock
+
+    def clone(self) -> 'SimState':
+        return SimState(self.tick, self.held[:], [dynamite[:] for dynamite in self.dynamite],
+                        {company: [trap[:] for trap in traps] for company, traps in self.traps.items()},
+                        set(self.trap_tiles), {company: avatar.clone() for company, avatar in self.avatars.items()},
+                        self.fuse_clock)
+
+    def due_dynamite(self) -> int:
+        """
+        How many dynamite at the front of the list blast on this tick.
+        """
+        due = 0
+        while due < len(self.dynamite) and self.dynamite[due][1] <= self.tick:
+            due += 1
+        return due
+
+    @staticmethod
+    def from_world(world, path_finder: PathFinder, tick: int) -> 'SimState':
+        """
+        Reads a SimState off a game board, both avatars included.
+        """
+        board_index = BoardIndex.of(world)
+        held = board_index.arrays().held.ravel().tolist()
+        avatars: dict[Company, SimAvatar] = {}
+        counters = InventoryCounters()
+        counters.update(world)
+
+        for index, found in board_index.get_objects(ObjectType.AVATAR).items():
+            avatar = found[0]
+            abilities = [avatar.dynamite_active_ability, avatar.landmine_active_ability, avatar.emp_active_ability]
+            inventory = counters.counts(avatar.company)[:]
+            avatars[avatar.company] = SimAvatar(
+                avatar.company, index, avatar.score, avatar.science_points,
+                avatar.movement_speed, avatar.drop_rate,
+                TechPlanner.mask_of(avatar.get_researched_techs()),
+                SimAvatar.from_fuses([ability.fuse for ability in abilities],
+                                     [ability.is_usable for ability in abilities]), inventory)
+
+        # a fuse of 0 means the dynamite already went off but DynamiteList skipped removing it; it goes off again
+        dynamite = [[path_finder.index_of(placed['position']['x'], placed['position']['y']),
+                     tick + max(placed['fuse'], 1), Company(placed['company'])]
+                    for placed in world.dynamite_list.to_json()['dynamite_items']]
+        traps = {company: [[path_finder.index_of(trap['position']['x'], trap['position']['y']), trap['range'],
+                            trap['steal_rate']] for trap in queue.to_json()['traps']]
+                 for company, queue in [(Company.CHURCH, world.church_trap_queue),
+                                        (Company.TURING, world.turing_trap_queue)]}
+        trap_tiles = {trap[0] for company_traps in traps.values() for trap in company_traps}
+        return SimState(tick, held, dynamite, traps, trap_tiles, avatars)
+
+
+class Simulator:
+    """
+    A forward model of MasterController.turn_logic over SimState.
+
+    step() keeps the engine's order: dynamite that is due blasts first, then each client's actions
+    (cut down the way turn_logic does, with INTERACT_CENTER appended) run through the movement, interact, mine,
+    defuse, buy-tech and place rules, with trap_detonation_control after every client that sent actions. The engine
+    rolls ore drops and trap steals at random. Drops come off each station's own generator, so here they follow the
+    OreIndex drop chains exactly; only trap steals are drawn with self.random.
+    Engine quirks that change outcomes (ability fuses, DynamiteList removal, TrapQueue.dequeue_trap_at) are kept.
+    """
+
+    MOVES: dict[ActionType, tuple[int, int]] = {action: (dx, dy) for dx, dy, action in PathFinder.DIRECTIONS}
+
+    def __init__(self, world, path_finder: PathFinder, ore_index: OreIndex, tech_planner: TechPlanner,
+                 rng: random.Random | None = None):
+        self.path_finder: PathFinder = path_finder
+        self.tech_planner: TechPlanner = tech_planner
+        self.random: random.Random = rng if rng is not None else random.Random(0)
+        # next_held[tile][code] is the ITEM_CODES code a station holds after handing out code (0 once it is used up)
+        self.next_held: dict[int, list[int]] = {}
+        for tile, chain in ore_index.drop_chains.items():
+            self.next_held[tile] = [0] * (len(ORE_TYPES) + 1)
+            for held, after in zip(chain, chain[1:]):
+                self.next_held[tile][ITEM_CODES[held]] = ITEM_CODES[after]
+        self.bases: dict[Company, int] = {
+            Company.CHURCH: BoardIndex.of(world).positions(ObjectType.CHURCH_STATION)[0],
+            Company.TURING: BoardIndex.of(world).positions(ObjectType.TURING_STATION)[0]}
+        self.points: dict[Company, list[int]] = {
+            company: [OreIndex.item_worth(item_type, company) if item_type != ObjectType.ANCIENT_TECH else 0
+                      for item_type in ORE_TYPES] for company in self.bases}
+        self.science: list[int] = [10 if item_type == ObjectType.ANCIENT_TECH else 0 for item_type in ORE_TYPES]
+        self.buy_techs: dict[ActionType, Tech] = {action: tech for tech, action in BUY_ACTIONS.items()}
+
+    def step(self, state: SimState, actions: dict[Company, list[ActionType]]) -> SimState:
+        """
+        Plays one turn on state (in place) and returns it.
+        :param actions: Each company's actions for the turn, in the order the engine runs its clients
+        """
+        state.tick += 1
+        due = state.due_dynamite()
+        if due > 0:
+            for dynamite in state.dynamite[:due]:
+                self.__blast(state, dynamite)
+            # DynamiteList.detonate removes entries while looping over them, so every second one it meets stays
+            state.dynamite = state.dynamite[1:due:2] + state.dynamite[due:]
+
+        for company, client_actions in actions.items():
+            if len(client_actions) == 0:
+                continue
+            avatar = state.avatars[company]
+            turn_actions = ActionCompiler.truncate(client_actions, avatar.movement_speed) \
+                + [ActionType.INTERACT_CENTER]
+            for action in turn_actions[:MAX_NUMBER_OF_ACTIONS_PER_TURN]:
+                self.__act(state, avatar, action)
+            self.__detonate_traps(state)
+        return state
+
+    def __coordinates(self, tile: int) -> tuple[int, int]:
+        y, x = divmod(tile, self.path_finder.width)
+        return x, y
+
+    def __distance(self, first: int, second: int) -> int:
+        (x1, y1), (x2, y2) = self.__coordinates(first), self.__coordinates(second)
+        return abs(x1 - x2) + abs(y1 - y2)
+
+    def __give_item(self, state: SimState, tile: int, avatar: SimAvatar, drop_rate: int) -> None:
+        """
+        OreOccupiableStation.give_item: hands out the held item drop_rate times, then moves down the drop chain.
+        """
+        held = state.held[tile]
+        given = min(drop_rate, avatar.free_slots())
+        avatar.inventory[held - 1] += given
+
+        state.held[tile] = self.next_held[tile][held] if tile in self.next_held else 0
+
+    def __blast(self, state: SimState, dynamite: list) -> None:
+        for tile in self.path_finder.geometry.plus(dynamite[0]):
+            if state.held[tile] != 0:
+                self.__give_item(state, tile, state.avatars[dynamite[2]], 1)
+
+    def __act(self, state: SimState, avatar: SimAvatar, action: ActionType) -> None:
+        if action in self.MOVES:
+            dx, dy = self.MOVES[action]
+            x, y = self.__coordinates(avatar.position)
+            if 0 <= x + dx < self.path_finder.width and 0 <= y + dy < self.path_finder.height:
+                target = self.path_finder.index_of(x + dx, y + dy)
+                if self.path_finder.passable[target] \
+                        and all(other.position != target for other in state.avatars.values()):
+                    avatar.position = target
+        elif action == ActionType.INTERACT_CENTER:
+            if avatar.position == self.bases[avatar.company]:
+                avatar.score += sum(count * points for count, points in
+                                    zip(avatar.inventory, self.points[avatar.company]))
+                avatar.science += sum(count * science for count, science in zip(avatar.inventory, self.science))
+                avatar.inventory = [0] * len(ORE_TYPES)
+        elif action == ActionType.MINE:
+            if avatar.free_slots() > 0 and state.held[avatar.position] != 0:
+                self.__give_item(state, avatar.position, avatar, avatar.drop_rate)
+        elif action == ActionType.DEFUSE:
+            if avatar.researched(Tech.TRAP_DEFUSAL):
+                self.__defuse(state, avatar)
+        elif action in self.buy_techs:
+            if avatar.position == self.bases[avatar.company]:
+                self.__buy(avatar, self.buy_techs[action])
+        elif action == ActionType.PLACE_DYNAMITE:
+            if avatar.researched(Tech.DYNAMITE) and avatar.is_usable(SimAvatar.DYNAMITE, state.fuse_clock) \
+                    and self.__free_for_placing(state, avatar.position):
+                state.dynamite.append([avatar.position, state.tick + DYNAMITE_FUSE, avatar.company])
+                avatar.reset_fuse(SimAvatar.DYNAMITE, state.fuse_clock)
+        elif action == ActionType.PLACE_LANDMINE:
+            if avatar.researched(Tech.LANDMINES) and not avatar.researched(Tech.EMPS) \
+                    and avatar.is_usable(SimAvatar.LANDMINE, state.fuse_clock) \
+                    and self.__free_for_placing(state, avatar.position):
+                self.__place_trap(state, avatar, [avatar.position, LANDMINE_RANGE, LANDMINE_STEAL_RATE])
+                avatar.reset_fuse(SimAvatar.LANDMINE, state.fuse_clock)
+        elif action == ActionType.PLACE_EMP:
+            if avatar.researched(Tech.EMPS) and avatar.is_usable(SimAvatar.EMP, state.fuse_clock) \
+                    and self.__free_for_placing(state, avatar.position):
+                self.__place_trap(state, avatar, [avatar.position, EMP_RANGE, EMP_STEAL_RATE])
+                avatar.reset_fuse(SimAvatar.EMP, state.fuse_clock)
+
+    def __buy(self, avatar: SimAvatar, tech: Tech) -> None:
+        if avatar.science < self.tech_planner.costs[tech] or not TechPlanner.can_research(avatar.techs, tech):
+            return
+        avatar.science -= self.tech_planner.costs[tech]
+        avatar.score += self.tech_planner.points[tech]
+        avatar.techs |= TECH_BITS[tech]
+        if tech in (Tech.IMPROVED_DRIVETRAIN, Tech.SUPERIOR_DRIVETRAIN):
+            avatar.movement_speed += 1
+        elif tech in (Tech.IMPROVED_MINING, Tech.SUPERIOR_MINING):
+            avatar.drop_rate += 1
+
+    def __free_for_placing(self, state: SimState, tile: int) -> bool:
+        return tile not in state.trap_tiles and all(dynamite[0] != tile or dynamite[1] <= state.tick
+                                                    for dynamite in state.dynamite)
+
+    def __place_trap(self, state: SimState, avatar: SimAvatar, trap: list) -> None:
+        queue = state.traps[avatar.company]
+        if len(queue) >= MAX_TRAPS:
+            state.trap_tiles.discard(queue.pop(0)[0])
+        queue.append(trap)
+        state.trap_tiles.add(trap[0])
+
+    def __defuse(self, state: SimState, avatar: SimAvatar) -> None:
+        try:
+            geometry = self.path_finder.geometry
+            for tile in geometry.in_column_order(geometry.diamond(avatar.position, TRAP_DEFUSAL_RANGE)):
+                state.trap_tiles.discard(tile)
+                for company in (Company.CHURCH, Company.TURING):
+                    # TrapQueue.dequeue_trap_at keeps the first trap and drops everything up to the match, and
+                    # can run off the end of the shortened queue (which turn_logic swallows as an IndexError)
+                    for i in range(len(state.traps[company]))[::-1]:
+                        if state.traps[company][i][0] == tile:
+                            state.traps[company] = state.traps[company][:1] + state.traps[company][i + 1:]
+        except IndexError:
+            pass
+
+    def __detonate_traps(self, state: SimState) -> None:
+        state.fuse_clock += 1
+        for owner, target in [(Company.CHURCH, Company.TURING), (Company.TURING, Company.CHURCH)]:
+            queue = state.traps[owner]
+            for i in range(len(queue))[::-1]:
+                if self.__distance(queue[i][0], state.avatars[target].position) <= queue[i][1]:
+                    self.__steal(state.avatars[owner], state.avatars[target], queue[i][2])
+                    state.trap_tiles.discard(queue[i][0])
+                    queue[i] = None
+            state.traps[owner] = [trap for trap in queue if trap is not None]
+
+    def __steal(self, owner: SimAvatar, target: SimAvatar, steal_rate: float) -> None:
+        for item in range(len(ORE_TYPES)):
+            for _ in range(target.inventory[item]):
+                if self.random.random() <= steal_rate:
+                    target.inventory[item] -= 1
+                    if owner.free_slots() > 0:
+                        owner.inventory[item] += 1
@@ -0,0 +1,123 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# The engine in launcher.pyz has to shadow the tracked game/ stub, which only carries the client-facing API
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'launcher.pyz'))
+
+from game.common.avatar import Avatar
+from game.common.enums import ActionType, Company
+from game.common.map.game_board import DynamiteList, GameBoard
+from game.quarry_rush.ability.active_ability import ActiveAbility
+from game.quarry_rush.entity.placeable.dynamite import Dynamite
+from game.utils.vector import Vector
+
+from base_client import OreIndex, PathFinder, TechPlanner
+from simulator import SimAvatar, Simulator, SimState
+
+LOGS = ROOT / 'logs'
+FIELDS = ['position', 'score', 'science', 'movement_speed', 'drop_rate', 'techs', 'inventory']
+
+
+def replay_mismatches(simulator: Simulator, boards: list, turn_actions: list[dict[Company, list[ActionType]]]) \
+        -> list[tuple[int, str]]:
+    """
+    Steps the simulator through a recorded game (the logs/turn_*.json boards) and lists where it disagrees.
+
+    Each turn starts again on the recorded board, so one miss does not spill into later turns. Ore drops follow the
+    stations' drop chains, so the only engine draws left to chance are trap steals, and only turns with one can differ.
+    :param boards:          The board after every turn, in order (boards[0] is the state the first replayed turn
+                            starts on)
+    :param turn_actions:    turn_actions[i] is what every company sent on the turn that turned boards[i] into
+                            boards[i + 1], in the order the engine ran the clients
+    :return:                (turn index, description) for every mismatch
+    """
+    mismatches: list[tuple[int, str]] = []
+    for turn, actions in enumerate(turn_actions):
+        predicted = simulator.step(SimState.from_world(boards[turn], simulator.path_finder, turn), actions)
+        recorded = SimState.from_world(boards[turn + 1], simulator.path_finder, turn + 1)
+        for company, avatar in recorded.avatars.items():
+            for field in FIELDS:
+                if getattr(predicted.avatars[company], field) != getattr(avatar, field):
+                    mismatches.append((turn, f'{company.name} {field}: simulated '
+                                             f'{getattr(predicted.avatars[company], field)}, '
+                                             f'recorded {getattr(avatar, field)}'))
+    return mismatches
+
+
+@pytest.fixture(scope='module')
+def recorded_game():
+    turns = sorted(LOGS.glob('turn_[0-9]*.json'))
+    if not turns:
+        pytest.skip('no recorded game in logs/')
+    logs = [json.loads(turn.read_text()) for turn in turns]
+    boards = [GameBoard().from_json(log['game_board']) for log in logs]
+    turn_actions = [{Company(client['avatar']['company']): [ActionType(action) for action in client['actions']]
+                     for client in log['clients']} for log in logs[1:]]
+    path_finder = PathFinder(boards[0])
+    simulator = Simulator(boards[0], path_finder, OreIndex(boards[0], path_finder),
+                          TechPlanner(Avatar().from_json(logs[0]['clients'][0]['avatar'])))
+    return simulator, boards, turn_actions
+
+
+def test_replay_matches_recorded_game(recorded_game):
+    assert replay_mismatches(*recorded_game) == []
+
+
+@pytest.mark.parametrize('ability', [SimAvatar.DYNAMITE, SimAvatar.LANDMINE, SimAvatar.EMP])
+def test_ability_timers_match_active_ability(ability):
+    # Each turn the client may use the ability (reset_fuse), then the engine decreases every fuse once
+    rng = random.Random(ability)
+    engine = ActiveAbility(cooldown=SimAvatar.COOLDOWNS[ability])
+    trace = []
+    for clock in range(60):
+        used = engine.is_usable and rng.random() < 0.4
+        trace.append((engine.fuse, engine.is_usable, used))
+        if used:
+            engine.reset_fuse()
+        engine.decrease_fuse()
+    trace.append((engine.fuse, engine.is_usable, False))
+
+    # Picking the timer up mid-game has to agree with the engine just as well as starting on a fresh ability
+    for start in range(len(trace)):
+        avatar = SimAvatar(Company.CHURCH, 0, ready_at=[0, 0, 0])
+        avatar.ready_at[ability] = SimAvatar.from_fuses([trace[start][0]], [trace[start][1]], start)[0]
+        for clock in range(start, len(trace)):
+            fuse, usable, used = trace[clock]
+            assert (avatar.fuse(ability, clock), avatar.is_usable(ability, clock)) == (fuse, usable), (start, clock)
+            if used:
+                avatar.reset_fuse(ability, clock)
+
+
+@pytest.mark.parametrize('fuses', [[1], [1, 1], [1, 1, 1], [1, 1, 1, 1, 2, 3], [0, 1, 1, 2, 2, 2, 3, 3, 3, 3]])
+def test_dynamite_removal_matches_dynamite_list(recorded_game, fuses):
+    simulator, boards, _ = recorded_game
+    width = simulator.path_finder.width
+    row = simulator.path_finder.height // 2
+    engine = DynamiteList()
+    for x, fuse in enumerate(fuses, start=1):
+        dynamite = Dynamite(Vector(x, row), company=Company.CHURCH)
+        dynamite.fuse = fuse
+        engine.add_dynamite(dynamite)
+
+    board = GameBoard().from_json(boards[0].to_json())
+    board.dynamite_list = engine
+    state = SimState.from_world(board, simulator.path_finder, 0)
+    for tick in range(1, 2 * len(fuses) + 2):
+        # The engine's turn: every dynamite burns its fuse down and blasts at 0, then DynamiteList drops the
+        # blasted ones, skipping every entry right after one it removed
+        for index in range(engine.size()):
+            engine.get_from_list(index).decrement_fuse()
+        engine.detonate()
+        simulator.step(state, {})
+
+        remaining = [engine.get_from_list(index) for index in range(engine.size())]
+        assert [dynamite[0] for dynamite in state.dynamite] \
+               == [row * width + dynamite.position.x for dynamite in remaining], tick
+        assert [dynamite[1] <= state.tick + 1 for dynamite in state.dynamite] \
+               == [dynamite.fuse <= 1 for dynamite in remaining], tick